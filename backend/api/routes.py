@@ -3,8 +3,10 @@ from backend.api.schemas import ChatRequest, ChatResponse, ComparisonResponse, U
 from fastapi.responses import StreamingResponse
 import json
 import asyncio
-from lightrag import LightRAG, QueryParam
+from lightrag import LightRAG
 from backend.core.rag_engine import RAGEngine
+from backend.core.chat_sessions import session_store
+from backend.core.llm_services import SUPPORTED_EXTENSIONS, parse_document
 import shutil
 import os
 from backend.config import settings
@@ -16,28 +18,24 @@ from typing import Union
 @router.post("/chat")
 async def chat(request: ChatRequest):
     rag = RAGEngine.get_instance()
-    print(f"DEBUG: Chat request received. message='{request.message[:20]}...', comparison_mode={request.comparison_mode}, stream={request.stream}")
-    
-    system_prompt = (
-        "STRICT INSTRUCTION: Output ONLY the relevant information. "
-        "DO NOT use introductory phrases like 'Dựa trên thông tin được cung cấp...', 'Dưới đây là...', etc. "
-        "Directly provide the answer based on the context."
-    )
-    
-    full_query = f"{request.message}\n\n{system_prompt}"
+    session = session_store.get_or_create(request.session_id, request.history)
+    print(f"DEBUG: Chat request received. message='{request.message[:20]}...', session={session.session_id}, comparison_mode={request.comparison_mode}, stream={request.stream}")
     
     if not request.stream:
         try:
             if request.comparison_mode:
-                naive_response = await rag.aquery(full_query, param=QueryParam(mode="naive"))
-                hybrid_response = await rag.aquery(full_query, param=QueryParam(mode="hybrid"))
+                naive_response, hybrid_response = await asyncio.gather(
+                    session.thread("naive").ask(rag, request.message, "naive"),
+                    session.thread("hybrid").ask(rag, request.message, "hybrid")
+                )
                 return ComparisonResponse(
-                    naive=ChatResponse(response=naive_response, mode="naive"),
-                    hybrid=ChatResponse(response=hybrid_response, mode="hybrid")
+                    naive=ChatResponse(response=naive_response, mode="naive", session_id=session.session_id),
+                    hybrid=ChatResponse(response=hybrid_response, mode="hybrid", session_id=session.session_id),
+                    session_id=session.session_id
                 )
             else:
-                response = await rag.aquery(full_query, param=QueryParam(mode="hybrid"))
-                return ChatResponse(response=response, mode="hybrid")
+                response = await session.thread("hybrid").ask(rag, request.message, "hybrid")
+                return ChatResponse(response=response, mode="hybrid", session_id=session.session_id)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -46,15 +44,11 @@ async def chat(request: ChatRequest):
         queue = asyncio.Queue()
         pending_tasks = set()
 
-        async def stream_wrapper(gen_func, mode):
+        async def stream_wrapper(generator, mode):
             try:
-                await queue.put(f"data: {json.dumps({'type': 'start', 'mode': mode})}\n\n")
-                generator = await gen_func
-                if hasattr(generator, '__aiter__'):
-                    async for chunk in generator:
-                        await queue.put(f"data: {json.dumps({'type': 'chunk', 'mode': mode, 'content': chunk})}\n\n")
-                else:
-                    await queue.put(f"data: {json.dumps({'type': 'chunk', 'mode': mode, 'content': str(generator)})}\n\n")
+                await queue.put(f"data: {json.dumps({'type': 'start', 'mode': mode, 'session_id': session.session_id})}\n\n")
+                async for chunk in generator:
+                    await queue.put(f"data: {json.dumps({'type': 'chunk', 'mode': mode, 'content': chunk})}\n\n")
             except Exception as e:
                 print(f"STREAM ERROR ({mode}): {str(e)}")
                 await queue.put(f"data: {json.dumps({'type': 'error', 'mode': mode, 'message': str(e)})}\n\n")
@@ -62,8 +56,8 @@ async def chat(request: ChatRequest):
         try:
             if request.comparison_mode:
                 # Start both in parallel
-                t1 = asyncio.create_task(stream_wrapper(rag.aquery(full_query, param=QueryParam(mode="naive", stream=True)), "naive"))
-                t2 = asyncio.create_task(stream_wrapper(rag.aquery(full_query, param=QueryParam(mode="hybrid", stream=True)), "hybrid"))
+                t1 = asyncio.create_task(stream_wrapper(session.thread("naive").ask_stream(rag, request.message, "naive"), "naive"))
+                t2 = asyncio.create_task(stream_wrapper(session.thread("hybrid").ask_stream(rag, request.message, "hybrid"), "hybrid"))
                 pending_tasks.update([t1, t2])
                 
                 while pending_tasks:
@@ -77,16 +71,13 @@ async def chat(request: ChatRequest):
                     while not queue.empty():
                         yield await queue.get()
                 
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'session_id': session.session_id})}\n\n"
             else:
                 # Standard single stream
-                generator = await rag.aquery(full_query, param=QueryParam(mode="hybrid", stream=True))
-                if hasattr(generator, '__aiter__'):
-                    async for chunk in generator:
-                        yield f"data: {json.dumps({'type': 'chunk', 'mode': 'hybrid', 'content': chunk})}\n\n"
-                else:
-                    yield f"data: {json.dumps({'type': 'chunk', 'mode': 'hybrid', 'content': str(generator)})}\n\n"
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield f"data: {json.dumps({'type': 'start', 'mode': 'hybrid', 'session_id': session.session_id})}\n\n"
+                async for chunk in session.thread("hybrid").ask_stream(rag, request.message, "hybrid"):
+                    yield f"data: {json.dumps({'type': 'chunk', 'mode': 'hybrid', 'content': chunk})}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'session_id': session.session_id})}\n\n"
         except Exception as e:
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
 
@@ -101,6 +92,12 @@ async def chat(request: ChatRequest):
         }
     )
 
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "deleted", "session_id": session_id}
+
 @router.get("/documents")
 async def list_documents():
     rag = RAGEngine.get_instance()
@@ -132,7 +129,7 @@ async def list_documents():
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_file(file: UploadFile = File(...)):
-    if not file.filename.endswith(".pdf") and not file.filename.endswith(".txt"):
+    if not file.filename.endswith(SUPPORTED_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
     
     file_path = os.path.join(settings.LIGHTRAG_WORKING_DIR, file.filename)
@@ -144,13 +141,7 @@ async def upload_file(file: UploadFile = File(...)):
     try:
         rag = RAGEngine.get_instance()
         
-        if file.filename.endswith(".pdf"):
-            from backend.core.llm_services import qwen_vl_parse_pdf
-            content = await qwen_vl_parse_pdf(file_path)
-        else:
-            # Assume TXT
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
+        content = await parse_document(file_path)
 
         if not content.strip():
             raise ValueError("File is empty or no text could be extracted")
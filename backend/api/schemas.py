@@ -4,6 +4,7 @@ from typing import List, Optional, Any, Dict
 class ChatRequest(BaseModel):
     message: str
     history: Optional[List[dict]] = []
+    session_id: Optional[str] = None
     stream: Optional[bool] = False
     comparison_mode: Optional[bool] = False
 
@@ -11,10 +12,12 @@ class ChatResponse(BaseModel):
     response: str
     mode: str = "hybrid"
     sources: Optional[List[Dict[str, Any]]] = []
+    session_id: Optional[str] = None
 
 class ComparisonResponse(BaseModel):
     naive: ChatResponse
     hybrid: ChatResponse
+    session_id: Optional[str] = None
 
 
 class UploadResponse(BaseModel):
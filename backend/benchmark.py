@@ -0,0 +1,253 @@
+"""
+Offline regression benchmark for naive vs hybrid retrieval.
+
+Usage (from the repository root or /app in the backend container, against a local
+Postgres with ingested data):
+    # Once, with litellm/Ollama reachable: record LLM + embedding responses
+    python -m backend.benchmark --record --save-baseline
+
+    # Afterwards, fully offline: replay the cassette and compare with the baseline
+    python -m backend.benchmark
+
+Questions are read from data/evaluation_guide.md at the repository root; the
+cassette and baseline are kept in backend/data/benchmark/. Both defaults are
+resolved from this file's location, not the working directory. For every question and mode the
+benchmark measures retrieval latency (only_need_context), prompt token count,
+number of Postgres queries and the overlap of the retrieved context with the
+saved baseline. The exit code is 1 when a regression is flagged.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import statistics
+from types import SimpleNamespace
+from lightrag import QueryParam
+from lightrag.kg.postgres_impl import PostgreSQLDB
+from backend.core import llm_services
+from backend.core.rag_engine import RAGEngine
+from backend.core.chat_sessions import SYSTEM_PROMPT
+
+MODES = ("naive", "hybrid")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GUIDE = os.path.join(os.path.dirname(BACKEND_DIR), "data", "evaluation_guide.md")
+DEFAULT_BENCHMARK_DIR = os.path.join(BACKEND_DIR, "data", "benchmark")
+
+
+def load_questions(guide_path: str) -> list[str]:
+    with open(guide_path, "r", encoding="utf-8") as f:
+        return re.findall(r'\*\*Question:\*\*\s*"(.+?)"', f.read())
+
+
+class Cassette:
+    """
+    Stands in for the AsyncOpenAI client used by llm_services. In record mode requests
+    go to the real client and responses are stored; in replay mode they are served
+    from the cassette and an unknown request is an error.
+    """
+
+    def __init__(self, path: str, record: bool):
+        self.path = path
+        self.record = record
+        self.entries: dict = {}
+        self.recorded_chats = 0
+        if not record:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self._client = llm_services.get_openai_client() if record else None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+        self.embeddings = SimpleNamespace(create=self._embeddings_create)
+
+    @staticmethod
+    def _key(kind: str, payload: dict) -> str:
+        raw = json.dumps({"kind": kind, **payload}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _chat_create(self, **kwargs):
+        if kwargs.get("stream"):
+            raise ValueError("Streaming completions are not supported by the benchmark cassette")
+        payload = {k: v for k, v in kwargs.items() if k != "extra_headers"}
+        key = self._key("chat", payload)
+        if self.record:
+            response = await self._client.chat.completions.create(**kwargs)
+            self.entries[key] = response.choices[0].message.content
+            self.recorded_chats += 1
+        elif key not in self.entries:
+            raise KeyError(f"Chat completion not in cassette ({key[:12]}); re-run with --record")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.entries[key]))])
+
+    async def _embeddings_create(self, **kwargs):
+        key = self._key("embedding", kwargs)
+        if self.record:
+            response = await self._client.embeddings.create(**kwargs)
+            self.entries[key] = [d.embedding for d in response.data]
+        elif key not in self.entries:
+            raise KeyError(f"Embedding not in cassette ({key[:12]}); re-run with --record")
+        return SimpleNamespace(data=[SimpleNamespace(embedding=e) for e in self.entries[key]])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+
+
+class QueryCounter:
+    """Counts statements sent to Postgres by wrapping PostgreSQLDB.query/execute."""
+
+    def __init__(self):
+        self.count = 0
+
+    def install(self):
+        for name in ("query", "execute"):
+            original = getattr(PostgreSQLDB, name)
+
+            async def counted(db, *args, _original=original, **kwargs):
+                self.count += 1
+                return await _original(db, *args, **kwargs)
+
+            setattr(PostgreSQLDB, name, counted)
+
+
+def context_lines(context: str) -> list[str]:
+    """Stable fingerprints of the non-empty lines of a retrieved context."""
+    lines = {line.strip() for line in context.splitlines() if line.strip()}
+    return sorted(hashlib.sha1(line.encode("utf-8")).hexdigest() for line in lines)
+
+
+def overlap(current: list[str], baseline: list[str]) -> float:
+    a, b = set(current), set(baseline)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def count_tokens(rag, text: str) -> int:
+    tokenizer = getattr(rag, "tokenizer", None)
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    import tiktoken
+    return len(tiktoken.encoding_for_model("gpt-4o-mini").encode(text))
+
+
+async def measure(rag, counter: QueryCounter, question: str, mode: str, repeat: int) -> dict:
+    latencies, queries = [], []
+    context = ""
+    for _ in range(repeat):
+        before = counter.count
+        t = time.perf_counter()
+        context = await rag.aquery(question, param=QueryParam(mode=mode, only_need_context=True))
+        latencies.append(time.perf_counter() - t)
+        queries.append(counter.count - before)
+    context = str(context or "")
+    prompt = f"{SYSTEM_PROMPT}\n\n---Context---\n{context}\n\n{question}"
+    return {
+        "latency": statistics.median(latencies),
+        "prompt_tokens": count_tokens(rag, prompt),
+        "storage_queries": max(queries),
+        "context": context_lines(context),
+    }
+
+
+def compare(results: dict, baseline: dict, args) -> list[str]:
+    regressions = []
+    print(f"\n{'#':>2} {'mode':<6} {'latency':>9} {'Δ':>7} {'tokens':>7} {'queries':>7} {'overlap':>7}")
+    for key, current in results.items():
+        index, mode = key.split("/")
+        base = baseline.get(key)
+        delta, ov = "", ""
+        if base:
+            change = (current["latency"] - base["latency"]) / base["latency"] if base["latency"] else 0.0
+            delta = f"{change:+.0%}"
+            ov_value = overlap(current["context"], base["context"])
+            ov = f"{ov_value:.2f}"
+            if change > args.latency_tolerance:
+                regressions.append(f"{key}: latency {base['latency']:.3f}s -> {current['latency']:.3f}s")
+            if current["storage_queries"] > base["storage_queries"]:
+                regressions.append(f"{key}: storage queries {base['storage_queries']} -> {current['storage_queries']}")
+            if current["prompt_tokens"] > base["prompt_tokens"] * (1 + args.token_tolerance):
+                regressions.append(f"{key}: prompt tokens {base['prompt_tokens']} -> {current['prompt_tokens']}")
+            if ov_value < args.min_overlap:
+                regressions.append(f"{key}: context overlap {ov_value:.2f} < {args.min_overlap:.2f}")
+        print(f"{index:>2} {mode:<6} {current['latency']:>8.3f}s {delta:>7} "
+              f"{current['prompt_tokens']:>7} {current['storage_queries']:>7} {ov:>7}")
+    return regressions
+
+
+async def run(args) -> int:
+    questions = load_questions(args.guide)
+    if not questions:
+        raise SystemExit(f"No questions found in {args.guide}")
+
+    cassette = Cassette(args.cassette, record=args.record)
+    llm_services._async_client = cassette
+    counter = QueryCounter()
+    counter.install()
+
+    # LightRAG's own LLM cache lives in Postgres; bypass it so every run exercises the same path.
+    rag = await RAGEngine.initialize(enable_llm_cache=False)
+
+    results = {}
+    try:
+        if args.record:
+            # One live pass fills the cassette; the measured runs below always replay,
+            # so recorded and replayed baselines are comparable.
+            for i, question in enumerate(questions, start=1):
+                for mode in MODES:
+                    before = cassette.recorded_chats
+                    await rag.aquery(question, param=QueryParam(mode=mode, only_need_context=True))
+                    # Hybrid retrieval extracts keywords with the LLM; no recorded call means
+                    # the answer came from a cache and replay would not be self-contained.
+                    if mode == "hybrid" and cassette.recorded_chats == before:
+                        raise SystemExit(f"Question {i} (hybrid) made no LLM call while recording; is the LLM cache still enabled?")
+            cassette.save()
+            cassette.record = False
+            print(f"Recorded {len(cassette.entries)} responses to {args.cassette}")
+
+        for i, question in enumerate(questions, start=1):
+            for mode in MODES:
+                results[f"{i}/{mode}"] = await measure(rag, counter, question, mode, args.repeat)
+    finally:
+        await rag.finalize_storages()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print("\nREGRESSIONS:")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    print("\nNo regressions." if baseline else "\nNo baseline to compare against.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay benchmark for naive vs hybrid retrieval")
+    parser.add_argument("--record", action="store_true", help="Call the live LLM/embedding endpoints and write the cassette")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's results as the new baseline")
+    parser.add_argument("--guide", default=DEFAULT_GUIDE, help="Markdown file with **Question:** entries")
+    parser.add_argument("--cassette", default=os.path.join(DEFAULT_BENCHMARK_DIR, "cassette.json"))
+    parser.add_argument("--baseline", default=os.path.join(DEFAULT_BENCHMARK_DIR, "baseline.json"))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per question; the median latency is reported")
+    parser.add_argument("--latency-tolerance", type=float, default=0.2, help="Allowed relative latency increase")
+    parser.add_argument("--token-tolerance", type=float, default=0.1, help="Allowed relative prompt token increase")
+    parser.add_argument("--min-overlap", type=float, default=0.9, help="Minimum Jaccard overlap with baseline context")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
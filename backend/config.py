@@ -34,6 +34,14 @@ class Settings(BaseSettings):
     
     LIGHTRAG_WORKING_DIR: str = "./backend/data"
 
+    # Server-side chat sessions (follow-up turns reuse retrieval + prompt prefix)
+    SESSION_TTL_SECONDS: int = 1800
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_HISTORY_TURNS: int = 6
+    SESSION_MAX_PROMPT_CHARS: int = 24000
+    SESSION_FIRST_CONTEXT_SHARE: float = 0.5
+    SESSION_FOLLOW_UP_CONTEXT_SHARE: float = 0.2
+
     @field_validator("ENTITY_TYPES", mode="before")
     @classmethod
     def parse_entity_types(cls, v):
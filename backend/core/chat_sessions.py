@@ -0,0 +1,276 @@
+import re
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import List, Optional, Dict
+from lightrag import QueryParam
+from backend.config import settings
+from backend.core.llm_services import deepseek_llm_func
+
+SYSTEM_PROMPT = (
+    "STRICT INSTRUCTION: Output ONLY the relevant information. "
+    "DO NOT use introductory phrases like 'Dựa trên thông tin được cung cấp...', 'Dưới đây là...', etc. "
+    "Directly provide the answer based on the context."
+)
+
+# Lines shorter than this are section headers / table delimiters of the LightRAG
+# context and are always kept; longer lines are deduplicated across turns.
+_MIN_DEDUP_LINE = 40
+
+_FOLLOW_UP_TEMPLATE = "---Additional Context---\n{context}\n\n---Question---\n{message}"
+
+# Context budgets are kept in characters but enforced by LightRAG in tokens.
+# tiktoken averages well under 4 characters per token on Vietnamese legal text, so
+# this ratio keeps the returned context inside its character budget.
+_CHARS_PER_TOKEN = 4
+# max_total_tokens also pays for LightRAG's own response template, the query and a
+# safety buffer, even with only_need_context; this is added on top of our budget.
+_LIGHTRAG_OVERHEAD_TOKENS = 1500
+# Below this there is no point in retrieving at all.
+_MIN_CONTEXT_TOKENS = 200
+
+
+def _terms(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _size(texts) -> int:
+    return sum(len(t.encode("utf-8")) for t in texts)
+
+
+def _context_param(mode: str, budget_chars: int) -> Optional[QueryParam]:
+    """
+    QueryParam that makes LightRAG truncate its context to ``budget_chars``, section
+    by section. Entities and relations get a sixth each so most of the budget goes
+    to document chunks, which carry the statute text. None if the budget is too small.
+    """
+    tokens = budget_chars // _CHARS_PER_TOKEN
+    if tokens < _MIN_CONTEXT_TOKENS:
+        return None
+    return QueryParam(
+        mode=mode,
+        only_need_context=True,
+        max_total_tokens=tokens + _LIGHTRAG_OVERHEAD_TOKENS,
+        max_entity_tokens=tokens // 6,
+        max_relation_tokens=tokens // 6,
+    )
+
+
+class PendingTurn:
+    """Retrieval result of a turn; only committed to the thread once the LLM has answered."""
+
+    def __init__(self, prompt: str, system_prompt: str, terms: List[str], lines: List[str]):
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.terms = terms
+        self.lines = lines
+
+
+class ConversationThread:
+    """
+    Per-mode conversation state. The system prompt (instructions + context of the
+    first turn) is frozen and history is append-only while it fits the window, so
+    follow-ups send the previous prompt as an exact prefix and Ollama can reuse its
+    prompt cache. The first turn's context gets SESSION_FIRST_CONTEXT_SHARE of
+    SESSION_MAX_PROMPT_CHARS and every follow-up retrieval at most
+    SESSION_FOLLOW_UP_CONTEXT_SHARE, which is kept free by compaction: when the
+    window or the remaining budget is exceeded, the oldest turns are dropped in one
+    block (down to half the window), so the prefix only changes every few turns.
+    Context lines and query terms owned by a dropped turn are forgotten, so they can
+    be retrieved again.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.system_prompt: Optional[str] = None
+        # Each turn: {"messages": [...], "terms": [...], "lines": [...]}
+        self.turns: List[dict] = []
+        self.seen_terms: set = set()
+        self.seen_lines: set = set()
+        self.size_bytes = 0
+
+    @property
+    def history(self) -> List[dict]:
+        return [m for turn in self.turns for m in turn["messages"]]
+
+    def prompt_chars(self) -> int:
+        return len(self.system_prompt or "") + sum(len(m["content"]) for m in self.history)
+
+    def _merge_context(self, context: str):
+        """
+        Drop context lines already in the prompt. Returns the merged text and the
+        deduplicated lines it introduces; empty if nothing new was retrieved.
+        """
+        kept, added = [], []
+        for line in context.splitlines():
+            key = line.strip()
+            if len(key) >= _MIN_DEDUP_LINE:
+                if key in self.seen_lines or key in added:
+                    continue
+                added.append(key)
+            kept.append(line)
+        if not added:
+            return "", []
+        return "\n".join(kept).strip(), added
+
+    async def prepare(self, rag, message: str, mode: str) -> PendingTurn:
+        """
+        Retrieve context for this turn and build the user prompt to send.
+        The first turn retrieves with the full message; follow-ups only query the
+        terms not seen before and skip retrieval when there are none or no budget is
+        left. Terms are only marked seen when their retrieval added context, and
+        nothing is committed to the thread until ``record`` is called.
+        """
+        max_chars = settings.SESSION_MAX_PROMPT_CHARS
+        remaining = max_chars - self.prompt_chars() - len(message)
+
+        if self.system_prompt is None:
+            budget = min(int(max_chars * settings.SESSION_FIRST_CONTEXT_SHARE), remaining - len(SYSTEM_PROMPT))
+            param = _context_param(mode, budget)
+            context, lines = "", []
+            if param is not None:
+                context = await rag.aquery(message, param=param)
+                context, lines = self._merge_context(str(context or ""))
+            system_prompt = f"{SYSTEM_PROMPT}\n\n---Context---\n{context}"
+            terms = list(dict.fromkeys(_terms(message))) if lines else []
+            return PendingTurn(message, system_prompt, terms, lines)
+
+        new_terms = [t for t in dict.fromkeys(_terms(message)) if t not in self.seen_terms]
+        budget = min(int(max_chars * settings.SESSION_FOLLOW_UP_CONTEXT_SHARE), remaining - len(_FOLLOW_UP_TEMPLATE))
+        param = _context_param(mode, budget)
+        if not new_terms or param is None:
+            return PendingTurn(message, self.system_prompt, [], [])
+
+        context = await rag.aquery(" ".join(new_terms), param=param)
+        context, lines = self._merge_context(str(context or ""))
+        if not context:
+            return PendingTurn(message, self.system_prompt, [], [])
+        prompt = _FOLLOW_UP_TEMPLATE.format(context=context, message=message)
+        return PendingTurn(prompt, self.system_prompt, new_terms, lines)
+
+    def record(self, turn: PendingTurn, answer: str):
+        if self.system_prompt is None:
+            # First-turn context lives in the frozen system prompt and is never evicted.
+            self.system_prompt = turn.system_prompt
+            self.seen_terms.update(turn.terms)
+            self.seen_lines.update(turn.lines)
+            self.size_bytes += _size([self.system_prompt, *turn.terms, *turn.lines])
+            terms, lines = [], []
+        else:
+            terms, lines = turn.terms, turn.lines
+        messages = [{"role": "user", "content": turn.prompt}, {"role": "assistant", "content": answer}]
+        self._append({"messages": messages, "terms": terms, "lines": lines})
+        self._compact()
+
+    def _append(self, turn: dict):
+        self.turns.append(turn)
+        self.seen_terms.update(turn["terms"])
+        self.seen_lines.update(turn["lines"])
+        self.size_bytes += _size([m["content"] for m in turn["messages"]] + turn["terms"] + turn["lines"])
+
+    def _evict(self, turn: dict):
+        self.seen_terms.difference_update(turn["terms"])
+        self.seen_lines.difference_update(turn["lines"])
+        self.size_bytes -= _size([m["content"] for m in turn["messages"]] + turn["terms"] + turn["lines"])
+
+    def _compact(self):
+        max_messages = settings.SESSION_HISTORY_TURNS * 2
+        # Leave room for the next follow-up retrieval.
+        max_chars = settings.SESSION_MAX_PROMPT_CHARS * (1 - settings.SESSION_FOLLOW_UP_CONTEXT_SHARE)
+        if len(self.history) <= max_messages and self.prompt_chars() <= max_chars:
+            return
+        while self.turns and (
+            len(self.history) > settings.SESSION_HISTORY_TURNS
+            or self.prompt_chars() > max_chars
+        ):
+            self._evict(self.turns.pop(0))
+
+    async def ask(self, rag, message: str, mode: str) -> str:
+        async with self.lock:
+            turn = await self.prepare(rag, message, mode)
+            answer = await deepseek_llm_func(turn.prompt, system_prompt=turn.system_prompt, history=self.history)
+            self.record(turn, answer)
+            return answer
+
+    async def ask_stream(self, rag, message: str, mode: str):
+        async with self.lock:
+            turn = await self.prepare(rag, message, mode)
+            generator = await deepseek_llm_func(
+                turn.prompt, system_prompt=turn.system_prompt, history=self.history, stream=True
+            )
+            parts = []
+            # A failing stream raises out of this loop, so a truncated answer is never recorded.
+            async for chunk in generator:
+                parts.append(chunk)
+                yield chunk
+            self.record(turn, "".join(parts))
+
+
+class ChatSession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.last_access = time.monotonic()
+        self.threads: Dict[str, ConversationThread] = {}
+
+    def thread(self, mode: str) -> ConversationThread:
+        if mode not in self.threads:
+            self.threads[mode] = ConversationThread()
+        return self.threads[mode]
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(t.size_bytes for t in self.threads.values())
+
+    def seed_history(self, history: List[dict]):
+        """Adopt client-side history for a session the server has not seen yet."""
+        messages = [
+            {"role": m["role"], "content": str(m["content"])}
+            for m in history
+            if m.get("role") in ("user", "assistant") and m.get("content")
+        ]
+        for mode in ("naive", "hybrid"):
+            thread = self.thread(mode)
+            for m in messages[-settings.SESSION_HISTORY_TURNS * 2:]:
+                thread._append({"messages": [m], "terms": [], "lines": []})
+            thread._compact()
+
+
+class SessionStore:
+    """In-memory chat sessions with TTL expiry and LRU eviction by total size."""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [
+            sid for sid, s in self._sessions.items()
+            if now - s.last_access > settings.SESSION_TTL_SECONDS
+        ]
+        for sid in expired:
+            del self._sessions[sid]
+
+        total = sum(s.size_bytes for s in self._sessions.values())
+        # Oldest sessions sit at the front; never evict the most recent one.
+        while total > settings.SESSION_MAX_BYTES and len(self._sessions) > 1:
+            _, evicted = self._sessions.popitem(last=False)
+            total -= evicted.size_bytes
+
+    def get_or_create(self, session_id: Optional[str] = None, history: Optional[List[dict]] = None) -> ChatSession:
+        self._prune()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = ChatSession(session_id or uuid.uuid4().hex)
+            if history:
+                session.seed_history(history)
+            self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        session.last_access = time.monotonic()
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+
+session_store = SessionStore()
@@ -99,6 +99,8 @@ async def deepseek_llm_func(
                         yield c
             except Exception as e:
                 print(f"LLM STREAM ERROR: {str(e)}")
+                # Let callers tell a broken stream from a finished one.
+                raise
             print("LLM: Stream generator finished")
         return stream_generator()
     else:
@@ -109,6 +111,7 @@ async def qwen_vl_parse_pdf(file_path: str) -> str:
     Parse PDF using Qwen 3 VL model via OpenRouter.
     Converts pages to images and sends them to the vision model.
     """
+    import asyncio
     import base64
     from io import BytesIO
     from pdf2image import convert_from_path
@@ -116,7 +119,8 @@ async def qwen_vl_parse_pdf(file_path: str) -> str:
     # Convert PDF to images
     # We limit to first few pages for efficiency in this demo, 
     # but you can process all of them.
-    images = convert_from_path(file_path, first_page=1, last_page=5)
+    # Rasterizing is CPU-bound, run it off the event loop so parallel parses overlap.
+    images = await asyncio.to_thread(convert_from_path, file_path, first_page=1, last_page=5)
     
     messages = [
         {
@@ -164,3 +168,14 @@ async def qwen_vl_parse_pdf(file_path: str) -> str:
     )
     
     return response.choices[0].message.content
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+async def parse_document(file_path: str) -> str:
+    """Extract text from a supported document (PDF via Qwen 3 VL, TXT as-is)."""
+    if file_path.endswith(".pdf"):
+        return await qwen_vl_parse_pdf(file_path)
+    # Assume TXT
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
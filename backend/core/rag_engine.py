@@ -8,7 +8,7 @@ class RAGEngine:
     _instance = None
 
     @classmethod
-    async def initialize(cls):
+    async def initialize(cls, enable_llm_cache: bool = True):
         """Asynchronously initialize the LightRAG storage pools."""
         if cls._instance is None:
             # Initialize custom embedding function
@@ -36,6 +36,8 @@ class RAGEngine:
                 vector_storage="PGVectorStorage",
                 graph_storage="PGGraphStorage",
                 doc_status_storage="PGDocStatusStorage",
+                # Read into global_config at construction; changing it later has no effect.
+                enable_llm_cache=enable_llm_cache,
                 addon_params={
                     "language": settings.SUMMARY_LANGUAGE,
                     "entity_types": settings.ENTITY_TYPES
@@ -0,0 +1,209 @@
+"""
+Bulk ingest a directory of legal documents into LightRAG.
+
+Usage (from the repository root):
+    python -m backend.ingest backend/data --workers 4 --batch-size 8
+
+Files are parsed in parallel and inserted in batches. Progress is checkpointed by
+LightRAG's doc_status storage: processed files are skipped, documents left
+enqueued by an interrupted run are processed first, and files whose earlier
+attempt FAILED are deleted from LightRAG and ingested again. Documents are
+keyed by file name, the same key POST /api/upload stores, so the result does not
+depend on which directory is passed; when two files share a name only the first
+one (in path order) is ingested.
+"""
+import os
+import time
+import asyncio
+import argparse
+from lightrag.base import DocStatus
+from backend.core.rag_engine import RAGEngine
+from backend.core.llm_services import SUPPORTED_EXTENSIONS, parse_document
+
+
+def find_documents(root: str) -> list[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(dirpath, name))
+    return sorted(paths)
+
+
+async def load_doc_status(rag) -> dict:
+    """Map file_path -> (doc_id, DocProcessingStatus) for every document LightRAG knows about."""
+    known = {}
+    page = 1
+    while True:
+        # Sort by id so rows do not shift between pages while the server updates doc_status.
+        docs, total = await rag.doc_status.get_docs_paginated(
+            page=page, page_size=200, sort_field="id", sort_direction="asc"
+        )
+        for doc_id, status_obj in docs:
+            if status_obj.file_path:
+                known[status_obj.file_path] = (doc_id, status_obj)
+        if not docs or page * 200 >= total:
+            return known
+        page += 1
+
+
+def status_value(status_obj) -> str:
+    return status_obj.status.value if hasattr(status_obj.status, "value") else str(status_obj.status)
+
+
+def is_failed(status_obj) -> bool:
+    return status_value(status_obj) == DocStatus.FAILED.value
+
+
+def is_in_flight(status_obj) -> bool:
+    return status_value(status_obj) not in (DocStatus.PROCESSED.value, DocStatus.FAILED.value)
+
+
+class IngestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.parse_seconds = 0.0
+        self.insert_seconds = 0.0
+        self.resume_seconds = 0.0
+        self.parsed = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.retried = 0
+        self.resumed: list[str] = []
+        self.submitted: list[str] = []
+        self.failed: list[tuple[str, str]] = []
+        self.chunks = 0
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        minutes = elapsed / 60 if elapsed else 0
+        print("\n=== Ingest report ===")
+        print(f"Documents inserted : {self.inserted} (skipped {self.skipped}, failed {len(self.failed)}, "
+              f"resumed {len(self.resumed)}, retried {self.retried})")
+        print(f"Chunks created     : {self.chunks}")
+        print(f"Wall time          : {elapsed:.1f}s")
+        print(f"Throughput         : {self.inserted / minutes if minutes else 0:.2f} docs/min, "
+              f"{self.chunks / elapsed if elapsed else 0:.2f} chunks/sec")
+        print("Time per stage:")
+        print(f"  resume pending   : {self.resume_seconds:.1f}s over {len(self.resumed)} documents")
+        print(f"  parse (summed)   : {self.parse_seconds:.1f}s over {self.parsed} files")
+        print(f"  insert/index     : {self.insert_seconds:.1f}s")
+        for path, error in self.failed:
+            print(f"FAILED {path}: {error}")
+
+
+async def ingest(root: str, workers: int, batch_size: int):
+    rag = await RAGEngine.initialize()
+    try:
+        await _ingest(rag, root, workers, batch_size)
+    finally:
+        await rag.finalize_storages()
+
+
+async def _ingest(rag, root: str, workers: int, batch_size: int):
+    stats = IngestStats()
+
+    # Finish whatever an interrupted run left enqueued before adding new documents.
+    # LightRAG only auto-resumes in-flight statuses; FAILED documents are retried below.
+    before = await load_doc_status(rag)
+    stats.resumed = [key for key, (_, status_obj) in before.items() if is_in_flight(status_obj)]
+    t0 = time.perf_counter()
+    await rag.apipeline_process_enqueue_documents()
+    stats.resume_seconds = time.perf_counter() - t0
+
+    known = await load_doc_status(rag)
+    resumed = set(stats.resumed)
+    todo = []
+    keys = set()
+    for path in find_documents(root):
+        key = os.path.basename(path)
+        if key in keys:
+            print(f"WARNING: skipping {path}, another file named {key} is already queued")
+            stats.skipped += 1
+        elif key in known and (key in resumed or not is_failed(known[key][1])):
+            # Processed, still in flight, or just attempted by the resume step (its outcome is reported below).
+            keys.add(key)
+            stats.skipped += 1
+        else:
+            if key in known:
+                # Drop the failed record, otherwise LightRAG would treat the re-insert as a duplicate.
+                await rag.adelete_by_doc_id(known[key][0])
+                stats.retried += 1
+            keys.add(key)
+            todo.append((path, key))
+    print(f"Found {len(todo) + stats.skipped} documents, {stats.skipped} skipped, "
+          f"{len(todo)} to process ({stats.retried} retries of failed documents)")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 2)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def parse(path: str, key: str):
+        async with semaphore:
+            t = time.perf_counter()
+            try:
+                content = await parse_document(path)
+                if not content.strip():
+                    raise ValueError("File is empty or no text could be extracted")
+                await queue.put((key, content))
+            except Exception as e:
+                stats.failed.append((key, str(e)))
+            finally:
+                stats.parse_seconds += time.perf_counter() - t
+                stats.parsed += 1
+
+    async def insert(batch: list[tuple[str, str]]):
+        t = time.perf_counter()
+        try:
+            await rag.ainsert([c for _, c in batch], file_paths=[k for k, _ in batch])
+            stats.submitted.extend(k for k, _ in batch)
+        except Exception as e:
+            stats.failed.extend((k, str(e)) for k, _ in batch)
+        stats.insert_seconds += time.perf_counter() - t
+        print(f"[{len(stats.submitted) + len(stats.failed)}/{len(todo)}] indexed batch of {len(batch)}")
+
+    async def produce():
+        await asyncio.gather(*(parse(path, key) for path, key in todo))
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    batch = []
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        batch.append(item)
+        if len(batch) >= batch_size:
+            await insert(batch)
+            batch = []
+    if batch:
+        await insert(batch)
+    await producer
+
+    # ainsert does not raise for per-document failures or content duplicates, so the
+    # outcome of every resumed and submitted document is read back from doc_status.
+    final = await load_doc_status(rag)
+    for key in stats.resumed + stats.submitted:
+        doc_id, status_obj = final.get(key, (None, None))
+        if status_obj is None:
+            stats.failed.append((key, "not recorded in doc_status (duplicate content?)"))
+        elif status_value(status_obj) == DocStatus.PROCESSED.value:
+            stats.inserted += 1
+            stats.chunks += getattr(status_obj, "chunks_count", None) or 0
+        else:
+            reason = getattr(status_obj, "error_msg", None) or f"status {status_value(status_obj)}"
+            stats.failed.append((key, reason))
+
+    stats.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest legal documents (PDF/TXT) into LightRAG")
+    parser.add_argument("directory", help="Directory to walk for documents")
+    parser.add_argument("--workers", type=int, default=4, help="Files parsed in parallel")
+    parser.add_argument("--batch-size", type=int, default=8, help="Documents per ainsert call")
+    args = parser.parse_args()
+    asyncio.run(ingest(args.directory, args.workers, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
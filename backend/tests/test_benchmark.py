@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from backend import benchmark
+from backend.benchmark import Cassette, compare, context_lines, overlap
+
+
+class StubClient:
+    """Live client stand-in for record mode; counts calls so replays can be told apart."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    async def _chat(self, **kwargs):
+        self.calls += 1
+        content = f"keywords for {kwargs['messages'][-1]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def _embed(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2, 0.3])])
+
+
+def recording_cassette(path):
+    cassette = Cassette(str(path), record=True)
+    cassette._client = StubClient()
+    return cassette
+
+
+def chat(cassette, content, **extra):
+    messages = [{"role": "user", "content": content}]
+    response = asyncio.run(cassette.chat.completions.create(model="qwen25-7b", messages=messages, **extra))
+    return response.choices[0].message.content
+
+
+def test_key_ignores_order_and_headers():
+    a = Cassette._key("chat", {"model": "m", "messages": [{"role": "user", "content": "x"}], "temperature": 0})
+    b = Cassette._key("chat", {"temperature": 0, "messages": [{"role": "user", "content": "x"}], "model": "m"})
+    assert a == b
+    assert a != Cassette._key("embedding", {"model": "m", "messages": [{"role": "user", "content": "x"}], "temperature": 0})
+
+    cassette = recording_cassette("unused.json")
+    chat(cassette, "mức phạt", extra_headers={"X-Title": "one"})
+    chat(cassette, "mức phạt", extra_headers={"X-Title": "two"})
+    assert len(cassette.entries) == 1 and cassette.recorded_chats == 2
+
+
+def test_record_then_replay_round_trip(tmp_path):
+    path = tmp_path / "benchmark" / "cassette.json"
+    cassette = recording_cassette(path)
+    recorded = chat(cassette, "mức phạt ô tô")
+    vector = asyncio.run(cassette.embeddings.create(model="ollama-embed", input="mức phạt ô tô"))
+    cassette.save()
+
+    replay = Cassette(str(path), record=False)
+    assert replay._client is None
+    assert chat(replay, "mức phạt ô tô") == recorded
+    replayed = asyncio.run(replay.embeddings.create(model="ollama-embed", input="mức phạt ô tô"))
+    assert replayed.data[0].embedding == vector.data[0].embedding
+
+
+def test_replay_miss_raises(tmp_path):
+    path = tmp_path / "cassette.json"
+    path.write_text("{}", encoding="utf-8")
+    replay = Cassette(str(path), record=False)
+    with pytest.raises(KeyError):
+        chat(replay, "câu hỏi chưa ghi")
+    with pytest.raises(KeyError):
+        asyncio.run(replay.embeddings.create(model="ollama-embed", input="câu hỏi chưa ghi"))
+    with pytest.raises(ValueError):
+        chat(replay, "mức phạt", stream=True)
+
+
+def test_context_lines_and_overlap():
+    a = context_lines("Điều 1\n\n  Điều 2  \nĐiều 1")
+    assert len(a) == 2
+    assert a == context_lines("Điều 2\nĐiều 1")
+    assert overlap(a, a) == 1.0
+    assert overlap(a, context_lines("Điều 2\nĐiều 3")) == pytest.approx(1 / 3)
+    assert overlap([], []) == 1.0
+
+
+def result(latency=1.0, tokens=1000, queries=10, context="Điều 1\nĐiều 2"):
+    return {"latency": latency, "prompt_tokens": tokens, "storage_queries": queries, "context": context_lines(context)}
+
+
+ARGS = SimpleNamespace(latency_tolerance=0.2, token_tolerance=0.1, min_overlap=0.9)
+
+
+def test_compare_within_tolerance_passes():
+    baseline = {"1/naive": result()}
+    assert compare({"1/naive": result(latency=1.15, tokens=1090)}, baseline, ARGS) == []
+    # Questions without a baseline are reported but never flagged.
+    assert compare({"2/hybrid": result(latency=9.0)}, baseline, ARGS) == []
+
+
+@pytest.mark.parametrize("current, flagged", [
+    (result(latency=1.3), "latency"),
+    (result(queries=11), "storage queries"),
+    (result(tokens=1200), "prompt tokens"),
+    (result(context="Điều 1\nĐiều 3"), "context overlap"),
+])
+def test_compare_flags_regressions(current, flagged):
+    regressions = compare({"1/hybrid": current}, {"1/hybrid": result()}, ARGS)
+    assert len(regressions) == 1
+    assert regressions[0].startswith(f"1/hybrid: {flagged}")
+
+
+def test_questions_are_read_from_the_evaluation_guide():
+    questions = benchmark.load_questions(benchmark.DEFAULT_GUIDE)
+    assert len(questions) == 5
+    assert all(q.endswith("?") for q in questions)
@@ -0,0 +1,188 @@
+import asyncio
+import pytest
+from backend.config import settings
+from backend.core import chat_sessions
+from backend.core.chat_sessions import SessionStore, ConversationThread, ChatSession
+
+
+class StubRAG:
+    """
+    Returns one long, query-specific context line per query term. With ``filler``,
+    appends that many characters of further context, truncated to the QueryParam
+    token budget at ~2.5 characters per token like LightRAG would.
+    """
+
+    def __init__(self, fail=False, filler=0):
+        self.queries = []
+        self.params = []
+        self.fail = fail
+        self.filler = filler
+
+    async def aquery(self, query, param):
+        self.queries.append(query)
+        self.params.append(param)
+        if self.fail:
+            raise TimeoutError("retrieval timed out")
+        lines = [f"Điều khoản liên quan đến '{term}' trong Luật Trật tự, an toàn giao thông" for term in query.split()]
+        context = "-----Chunks-----\n" + "\n".join(lines)
+        if self.filler:
+            row = f"Khoản quy định chi tiết về {query} tại Luật Đường bộ số 35/2024/QH15"
+            filler = [f"{row} #{i}" for i in range(self.filler // len(row))]
+            context += "\n" + "\n".join(filler)
+            limit = int((param.max_total_tokens - chat_sessions._LIGHTRAG_OVERHEAD_TOKENS) * 2.5)
+            context = context[:limit].rsplit("\n", 1)[0]
+        return context
+
+
+@pytest.fixture(autouse=True)
+def session_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_SECONDS", 60)
+    monkeypatch.setattr(settings, "SESSION_MAX_BYTES", 10**6)
+    monkeypatch.setattr(settings, "SESSION_HISTORY_TURNS", 2)
+    monkeypatch.setattr(settings, "SESSION_MAX_PROMPT_CHARS", 10**6)
+
+
+def turn(thread, rag, message, answer="ok"):
+    pending = asyncio.run(thread.prepare(rag, message, "hybrid"))
+    thread.record(pending, answer)
+    return pending
+
+
+def test_prune_expires_idle_sessions():
+    store = SessionStore()
+    old = store.get_or_create("old")
+    old.last_access -= 120
+    store.get_or_create("new")
+    assert store.get_or_create("old") is not old
+
+
+def test_prune_evicts_least_recently_used_over_size():
+    store = SessionStore()
+    rag = StubRAG()
+    for sid in ("a", "b", "c"):
+        turn(store.get_or_create(sid).thread("hybrid"), rag, "mức phạt vượt đèn đỏ")
+    settings.SESSION_MAX_BYTES = store.get_or_create("c").size_bytes * 2
+    store.get_or_create("b")  # b becomes most recently used, a is oldest
+    store.get_or_create("d")
+    assert set(store._sessions) == {"b", "c", "d"}
+
+
+def test_seed_history_filters_and_trims():
+    session = ChatSession("s")
+    history = [
+        {"role": "system", "content": "ignored"},
+        {"role": "user", "content": ""},
+    ] + [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"} for i in range(6)]
+    session.seed_history(history)
+    for mode in ("naive", "hybrid"):
+        assert [m["content"] for m in session.thread(mode).history] == ["m2", "m3", "m4", "m5"]
+
+
+def test_follow_up_queries_only_new_terms_and_dedups_context():
+    thread, rag = ConversationThread(), StubRAG()
+    first = turn(thread, rag, "Mức phạt ô tô vượt đèn đỏ?")
+    assert rag.queries == ["Mức phạt ô tô vượt đèn đỏ?"]
+    assert first.prompt == "Mức phạt ô tô vượt đèn đỏ?"
+    assert "'phạt'" in thread.system_prompt
+
+    follow_up = turn(thread, rag, "còn xe máy thì sao?")
+    assert rag.queries[-1] == "còn xe máy thì sao"
+    assert "---Additional Context---" in follow_up.prompt
+    assert "'máy'" in follow_up.prompt
+
+    repeat = turn(thread, rag, "xe máy thì sao")
+    assert len(rag.queries) == 2
+    assert repeat.prompt == "xe máy thì sao"
+
+
+def test_failed_retrieval_does_not_mark_terms_seen():
+    thread = ConversationThread()
+    turn(thread, StubRAG(), "mức phạt ô tô")
+    with pytest.raises(TimeoutError):
+        asyncio.run(thread.prepare(StubRAG(fail=True), "xe máy", "hybrid"))
+    assert "máy" not in thread.seen_terms
+
+    rag = StubRAG()
+    turn(thread, rag, "xe máy")
+    assert rag.queries == ["xe máy"]
+
+
+def test_evicted_turns_release_terms_and_context():
+    thread, rag = ConversationThread(), StubRAG()
+    turn(thread, rag, "mức phạt ô tô")
+    turn(thread, rag, "xe máy")
+    turn(thread, rag, "xe đạp")
+    # Window of 2 turns exceeded: compacted down to the newest turn only.
+    assert [m["content"] for m in thread.history if m["role"] == "user"][-1].endswith("xe đạp")
+    assert len(thread.history) == 2
+    assert "máy" not in thread.seen_terms
+
+    follow_up = turn(thread, rag, "xe máy")
+    # "xe" was owned by the evicted "xe máy" turn as well.
+    assert rag.queries[-1] == "xe máy"
+    assert "'máy'" in follow_up.prompt
+
+
+def test_prompt_size_is_bounded():
+    settings.SESSION_MAX_PROMPT_CHARS = 400
+    thread, rag = ConversationThread(), StubRAG()
+    for message in ("mức phạt ô tô", "xe máy", "xe đạp", "xe tải"):
+        pending = turn(thread, rag, message, answer="x" * 50)
+        assert len(pending.system_prompt) + len(pending.prompt) <= 400
+        assert thread.prompt_chars() <= 400
+
+
+def test_context_larger_than_budget_leaves_room_for_follow_ups():
+    settings.SESSION_MAX_PROMPT_CHARS = 24000
+    thread, rag = ConversationThread(), StubRAG(filler=110000)
+    turn(thread, rag, "Mức phạt ô tô vượt đèn đỏ?")
+    assert rag.params[0].max_entity_tokens < rag.params[0].max_total_tokens
+    assert len(thread.system_prompt) <= 24000 * settings.SESSION_FIRST_CONTEXT_SHARE
+
+    follow_up = turn(thread, rag, "còn xe máy thì sao?")
+    assert rag.queries[-1] == "còn xe máy thì sao"
+    assert "'máy'" in follow_up.prompt
+    assert "máy" in thread.seen_terms
+    assert thread.prompt_chars() <= 24000
+
+
+def test_no_budget_skips_retrieval_and_leaves_terms_unseen():
+    thread, rag = ConversationThread(), StubRAG()
+    turn(thread, rag, "mức phạt ô tô")
+    settings.SESSION_MAX_PROMPT_CHARS = thread.prompt_chars() + 100
+    pending = asyncio.run(thread.prepare(rag, "xe máy", "hybrid"))
+    assert rag.queries == ["mức phạt ô tô"]
+    assert pending.terms == [] and pending.prompt == "xe máy"
+
+
+def test_follow_up_without_new_context_leaves_terms_unseen():
+    class RepeatingRAG(StubRAG):
+        async def aquery(self, query, param):
+            self.queries.append(query)
+            return "-----Chunks-----\nĐiều khoản chung về trật tự, an toàn giao thông đường bộ"
+
+    thread, rag = ConversationThread(), RepeatingRAG()
+    turn(thread, rag, "mức phạt ô tô")
+    pending = turn(thread, rag, "xe máy")
+    assert pending.prompt == "xe máy"
+    assert "máy" not in thread.seen_terms
+
+
+def test_failed_stream_is_not_recorded(monkeypatch):
+    async def broken_llm(prompt, system_prompt=None, history=None, **kwargs):
+        async def stream():
+            yield "Theo Điều"
+            raise ConnectionError("stream dropped")
+        return stream()
+
+    monkeypatch.setattr(chat_sessions, "deepseek_llm_func", broken_llm)
+    thread = ConversationThread()
+
+    async def consume():
+        async for _ in thread.ask_stream(StubRAG(), "mức phạt ô tô", "hybrid"):
+            pass
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(consume())
+    assert thread.system_prompt is None
+    assert thread.history == [] and thread.seen_terms == set()
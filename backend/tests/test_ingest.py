@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from lightrag.base import DocStatus
+from backend import ingest
+
+
+class StubDocStatus:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def get_docs_paginated(self, page=1, page_size=50, sort_field="updated_at", sort_direction="desc"):
+        assert sort_field == "id"
+        items = sorted(self.docs.items())
+        return items[(page - 1) * page_size:page * page_size], len(items)
+
+
+class StubRAG:
+    """
+    Marks documents containing 'broken' as FAILED and drops 'dup' like a content duplicate.
+    The resume step finishes PENDING documents, like LightRAG it leaves FAILED ones alone.
+    """
+
+    def __init__(self, docs=None):
+        self.doc_status = StubDocStatus(docs or {})
+        self.inserted = []
+        self.deleted = []
+        self.finalized = False
+
+    async def apipeline_process_enqueue_documents(self):
+        for status_obj in self.doc_status.docs.values():
+            if status_obj.status == DocStatus.PENDING:
+                status_obj.status = DocStatus.PROCESSED
+
+    async def adelete_by_doc_id(self, doc_id):
+        self.deleted.append(doc_id)
+        del self.doc_status.docs[doc_id]
+
+    async def ainsert(self, contents, file_paths):
+        for content, path in zip(contents, file_paths):
+            self.inserted.append(path)
+            if content == "dup":
+                continue
+            status = DocStatus.FAILED if content == "broken" else DocStatus.PROCESSED
+            self.doc_status.docs[f"doc-{path}"] = SimpleNamespace(
+                status=status, file_path=path, chunks_count=3, error_msg="extraction failed"
+            )
+
+    async def finalize_storages(self):
+        self.finalized = True
+
+
+def run_ingest(monkeypatch, tmp_path, rag, files):
+    for rel, content in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+
+    async def initialize():
+        return rag
+
+    monkeypatch.setattr(ingest.RAGEngine, "initialize", initialize)
+    stats = {}
+    monkeypatch.setattr(ingest.IngestStats, "report", lambda self: stats.update(vars(self)))
+    asyncio.run(ingest.ingest(str(tmp_path), workers=2, batch_size=2))
+    return stats
+
+
+def test_documents_are_keyed_by_file_name(monkeypatch, tmp_path):
+    known = {"doc-1": SimpleNamespace(status=DocStatus.PROCESSED, file_path="a.txt", chunks_count=1)}
+    rag = StubRAG(known)
+    stats = run_ingest(monkeypatch, tmp_path, rag, {
+        "data/a.txt": "luật a",
+        "data/b.txt": "luật b",
+        "other/b.txt": "luật b khác",
+    })
+    assert rag.inserted == ["b.txt"]
+    assert stats["skipped"] == 2
+
+
+def test_report_reads_outcome_from_doc_status(monkeypatch, tmp_path):
+    rag = StubRAG()
+    stats = run_ingest(monkeypatch, tmp_path, rag, {
+        "ok.txt": "luật",
+        "broken.txt": "broken",
+        "dup.txt": "dup",
+        "empty.txt": "  ",
+    })
+    assert stats["inserted"] == 1
+    assert stats["chunks"] == 3
+    assert sorted(key for key, _ in stats["failed"]) == ["broken.txt", "dup.txt", "empty.txt"]
+
+
+def test_failed_documents_are_retried(monkeypatch, tmp_path):
+    known = {"doc-old": SimpleNamespace(status=DocStatus.FAILED, file_path="a.txt", chunks_count=0)}
+    rag = StubRAG(known)
+    stats = run_ingest(monkeypatch, tmp_path, rag, {"a.txt": "luật a"})
+    assert rag.deleted == ["doc-old"]
+    assert rag.inserted == ["a.txt"]
+    assert stats["inserted"] == 1 and stats["retried"] == 1 and stats["skipped"] == 0
+
+
+def test_resumed_documents_count_towards_throughput(monkeypatch, tmp_path):
+    known = {"doc-1": SimpleNamespace(status=DocStatus.PENDING, file_path="a.txt", chunks_count=5)}
+    rag = StubRAG(known)
+    stats = run_ingest(monkeypatch, tmp_path, rag, {"a.txt": "luật a", "b.txt": "luật b"})
+    assert rag.inserted == ["b.txt"]
+    assert stats["resumed"] == ["a.txt"]
+    assert stats["inserted"] == 2 and stats["chunks"] == 8
+
+
+def test_storages_are_finalized_on_error(monkeypatch, tmp_path):
+    rag = StubRAG()
+
+    async def broken_resume():
+        raise RuntimeError("pipeline busy")
+
+    rag.apipeline_process_enqueue_documents = broken_resume
+    with pytest.raises(RuntimeError):
+        run_ingest(monkeypatch, tmp_path, rag, {"a.txt": "luật a"})
+    assert rag.finalized
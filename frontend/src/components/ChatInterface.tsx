@@ -23,6 +23,7 @@ export default function ChatInterface({ comparisonMode }: { comparisonMode: bool
   const [input, setInput] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const scrollRef = useRef<HTMLDivElement>(null)
+  const sessionIdRef = useRef<string | null>(null)
 
   useEffect(() => {
     if (scrollRef.current) {
@@ -60,6 +61,7 @@ export default function ChatInterface({ comparisonMode }: { comparisonMode: bool
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ 
           message: input,
+          session_id: sessionIdRef.current,
           comparison_mode: comparisonMode,
           stream: true
         })
@@ -87,6 +89,7 @@ export default function ChatInterface({ comparisonMode }: { comparisonMode: bool
           
           try {
             const data = JSON.parse(trimmedLine.slice(6))
+            if (data.session_id) sessionIdRef.current = data.session_id
             
             if (data.type === 'chunk') {
               setMessages(prev => prev.map(msg => {